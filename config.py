@@ -42,6 +42,18 @@ MAX_PRICE_USD = 15
 # Час між перевірками в секундах (не рекомендується менше 60 — Steam може заблокувати)
 CHECK_INTERVAL_SECONDS = 120
 
+# Адаптивний інтервал: після знахідки інтервал зменшується вдвічі (не нижче мінімуму),
+# після кількох порожніх перевірок поспіль — збільшується вдвічі (не вище максимуму)
+MIN_CHECK_INTERVAL_SECONDS = 60
+MAX_CHECK_INTERVAL_SECONDS = 600
+EMPTY_CHECKS_BEFORE_BACKOFF = 3
+
+# --- Сповіщені лістинги ---
+# Файл, де зберігаються ID вже сповіщених лістингів (щоб не дублювати після перезапуску)
+NOTIFIED_FILE = "notified_listings.jsonl"
+# Скільки днів пам'ятати сповіщений лістинг
+NOTIFIED_TTL_DAYS = 7
+
 # --- Логування ---
 LOG_FILE = "parser.log"
 LOG_LEVEL = "DEBUG"  # DEBUG, INFO, WARNING, ERROR
@@ -5,7 +5,7 @@ Steam Dota 2 Market Parser — головний скрипт.
 """
 
 import sys
-import time
+import asyncio
 import logging
 from datetime import datetime
 
@@ -54,6 +54,21 @@ def validate_config():
     if config.CHECK_INTERVAL_SECONDS < 30:
         errors.append("⚠️ CHECK_INTERVAL_SECONDS занадто малий (мінімум 30)")
 
+    if config.MIN_CHECK_INTERVAL_SECONDS < 30:
+        errors.append("⚠️ MIN_CHECK_INTERVAL_SECONDS занадто малий (мінімум 30)")
+
+    if config.MAX_CHECK_INTERVAL_SECONDS < config.MIN_CHECK_INTERVAL_SECONDS:
+        errors.append("❌ MAX_CHECK_INTERVAL_SECONDS менший за MIN_CHECK_INTERVAL_SECONDS")
+    elif not (config.MIN_CHECK_INTERVAL_SECONDS <= config.CHECK_INTERVAL_SECONDS
+              <= config.MAX_CHECK_INTERVAL_SECONDS):
+        errors.append(
+            "❌ CHECK_INTERVAL_SECONDS має бути між MIN_CHECK_INTERVAL_SECONDS "
+            "та MAX_CHECK_INTERVAL_SECONDS"
+        )
+
+    if config.EMPTY_CHECKS_BEFORE_BACKOFF < 1:
+        errors.append("❌ EMPTY_CHECKS_BEFORE_BACKOFF має бути не менше 1")
+
     return errors
 
 
@@ -68,6 +83,114 @@ def print_banner():
     print(banner)
 
 
+async def notify_items(parser: SteamMarketParser, notifier: TelegramNotifier, items: list[dict]):
+    """Надсилає сповіщення про знайдені предмети (працює паралельно з наступною перевіркою)."""
+    logger = logging.getLogger("main")
+
+    sent = []
+    try:
+        # Всі предмети — одним повідомленням (розбивається лише при перевищенні ліміту)
+        sent = await notifier.send_batch_async(items)
+
+        for item in sent:
+            # Запис у файл — не в циклі подій
+            await asyncio.to_thread(parser.mark_as_notified, item["listing_id"])
+            logger.info(
+                f"📨 Сповіщення відправлено: {item['name']} — {item['price']}"
+            )
+    finally:
+        # Знімаємо резерв з невідправлених (навіть якщо розсилка впала) —
+        # спробуємо сповістити наступного разу
+        sent_ids = {item["listing_id"] for item in sent}
+        for item in items:
+            if item["listing_id"] not in sent_ids:
+                parser.release_listing(item["listing_id"])
+                logger.warning(
+                    f"⚠️ Не вдалося відправити сповіщення для: {item['name']}"
+                )
+
+
+async def monitor(parser: SteamMarketParser, notifier: TelegramNotifier):
+    """
+    Цикл моніторингу з фіксованим інтервалом між стартами перевірок.
+    Сторінки лістингів качаються асинхронно в цьому ж циклі подій,
+    сповіщення — фоновою задачею, тож Telegram не затримує наступну перевірку.
+    """
+    logger = logging.getLogger("main")
+    loop = asyncio.get_running_loop()
+    notify_tasks = set()
+    check_count = 0
+
+    def notify_done(task: asyncio.Task):
+        notify_tasks.discard(task)
+        # Інакше виняток фонової задачі ніхто не побачить
+        if not task.cancelled() and task.exception():
+            logger.critical("💥 Помилка відправки сповіщень", exc_info=task.exception())
+
+    async def tick():
+        now = datetime.now().strftime("%H:%M:%S")
+        logger.info(f"🔄 Перевірка #{check_count} о {now}")
+
+        # Парсимо лістинги
+        found_items = await parser.parse_listings(
+            item_name=config.ITEM_NAME,
+            desired_gems=config.DESIRED_GEMS if config.DESIRED_GEMS else None,
+            desired_styles=config.DESIRED_STYLES if config.DESIRED_STYLES else None,
+            max_price=config.MAX_PRICE_USD,
+        )
+
+        if not found_items:
+            logger.info("😴 Нічого не знайдено, чекаємо...")
+            return False
+
+        logger.info(f"🎉 Знайдено {len(found_items)} предмет(ів)!")
+
+        # Резервуємо лістинги перед відправкою — попередня розсилка могла
+        # ще тривати, і один лістинг не повинен потрапити у дві розсилки
+        found_items = [item for item in found_items if parser.claim_listing(item["listing_id"])]
+
+        # Обмеження: максимум 5 сповіщень за раз щоб не спамити
+        items_to_notify = found_items[:5]
+        if len(found_items) > 5:
+            logger.info(f"📬 Надсилаю перші 5 з {len(found_items)}, решта — наступного разу")
+            for item in found_items[5:]:
+                parser.release_listing(item["listing_id"])
+
+        if items_to_notify:
+            task = asyncio.create_task(notify_items(parser, notifier, items_to_notify))
+            notify_tasks.add(task)
+            task.add_done_callback(notify_done)
+
+        return True
+
+    # Адаптивний інтервал: частіше після знахідок, рідше коли на маркеті тихо
+    interval = config.CHECK_INTERVAL_SECONDS
+    empty_checks = 0
+
+    try:
+        while True:
+            check_count += 1
+            started = loop.time()
+
+            if await tick():
+                empty_checks = 0
+                interval = max(config.MIN_CHECK_INTERVAL_SECONDS, interval // 2)
+            else:
+                empty_checks += 1
+                if empty_checks >= config.EMPTY_CHECKS_BEFORE_BACKOFF:
+                    empty_checks = 0
+                    interval = min(config.MAX_CHECK_INTERVAL_SECONDS, interval * 2)
+
+            # Дедлайн рахуємо від початку перевірки (монотонний час), тож
+            # тривалість самої перевірки не зсуває графік
+            delay = max(0.0, started + interval - loop.time())
+            logger.info(f"⏳ Наступна перевірка через {delay:.0f} сек. (інтервал {interval} сек.)")
+            await asyncio.sleep(delay)
+    finally:
+        # HTTP-сесія парсера прив'язана до цього циклу подій — закриваємо в ньому ж
+        await parser.close()
+
+
 def main():
     """Головна функція — запускає цикл моніторингу."""
 
@@ -94,6 +217,8 @@ def main():
     parser = SteamMarketParser(
         app_id=config.DOTA2_APP_ID,
         proxy=config.PROXY,
+        notified_path=config.NOTIFIED_FILE,
+        notified_ttl=config.NOTIFIED_TTL_DAYS * 86400,
     )
 
     # Перевірка з'єднання з Telegram ботом
@@ -115,7 +240,8 @@ def main():
         f"🎨 <b>Фільтр стилів:</b> {styles_filter}\n"
         f"💎 <b>Фільтр гемів:</b> {gems_filter}\n"
         f"💰 <b>Макс. ціна:</b> {price_filter}\n"
-        f"⏰ <b>Інтервал:</b> кожні {config.CHECK_INTERVAL_SECONDS} сек.\n"
+        f"⏰ <b>Інтервал:</b> кожні {config.CHECK_INTERVAL_SECONDS} сек. "
+        f"(адаптивно {config.MIN_CHECK_INTERVAL_SECONDS}–{config.MAX_CHECK_INTERVAL_SECONDS})\n"
     )
     notifier.send_message(start_msg)
 
@@ -123,59 +249,13 @@ def main():
     print(f"🎨 Фільтр стилів: {styles_filter}")
     print(f"💎 Фільтр гемів: {gems_filter}")
     print(f"💰 Макс. ціна: {price_filter}")
-    print(f"⏰ Інтервал перевірки: {config.CHECK_INTERVAL_SECONDS} секунд")
+    print(f"⏰ Інтервал перевірки: {config.CHECK_INTERVAL_SECONDS} секунд "
+          f"(адаптивно {config.MIN_CHECK_INTERVAL_SECONDS}–{config.MAX_CHECK_INTERVAL_SECONDS})")
     print(f"\n{'='*55}")
     print("🟢 Парсер працює... (Ctrl+C для зупинки)\n")
 
-    check_count = 0
-
     try:
-        while True:
-            check_count += 1
-            now = datetime.now().strftime("%H:%M:%S")
-            logger.info(f"🔄 Перевірка #{check_count} о {now}")
-
-            # Парсимо лістинги
-            found_items = parser.parse_listings(
-                item_name=config.ITEM_NAME,
-                desired_gems=config.DESIRED_GEMS if config.DESIRED_GEMS else None,
-                desired_styles=config.DESIRED_STYLES if config.DESIRED_STYLES else None,
-                max_price=config.MAX_PRICE_USD,
-            )
-
-            if found_items:
-                logger.info(f"🎉 Знайдено {len(found_items)} предмет(ів)!")
-
-                # Обмеження: максимум 5 сповіщень за раз щоб не спамити
-                items_to_notify = found_items[:5]
-                if len(found_items) > 5:
-                    logger.info(f"📬 Надсилаю перші 5 з {len(found_items)}, решта — наступного разу")
-
-                for item in items_to_notify:
-                    # Форматуємо та відправляємо повідомлення
-                    message = notifier.format_item_message(item)
-                    success = notifier.send_message(message)
-
-                    if success:
-                        parser.mark_as_notified(item["listing_id"])
-                        logger.info(
-                            f"📨 Сповіщення відправлено: {item['name']} — {item['price']}"
-                        )
-                    else:
-                        logger.warning(
-                            f"⚠️ Не вдалося відправити сповіщення для: {item['name']}"
-                        )
-
-                    # Невелика пауза між повідомленнями
-                    time.sleep(1)
-            else:
-                logger.info("😴 Нічого не знайдено, чекаємо...")
-
-            # Чекаємо перед наступною перевіркою
-            logger.info(
-                f"⏳ Наступна перевірка через {config.CHECK_INTERVAL_SECONDS} сек."
-            )
-            time.sleep(config.CHECK_INTERVAL_SECONDS)
+        asyncio.run(monitor(parser, notifier))
 
     except KeyboardInterrupt:
         print("\n\n🛑 Парсер зупинений користувачем.")
@@ -3,137 +3,259 @@
 Працює через публічне Steam Market API (без авторизації).
 """
 
+import asyncio
+import html
+import json
 import logging
+import os
 import time
 import re
-import requests
-from urllib.parse import quote
+import threading
+import aiohttp
+import orjson
+from aiohttp_socks import ProxyConnector
+from cachetools import LRUCache, TTLCache
+from urllib.parse import quote, urlencode
 
 logger = logging.getLogger(__name__)
 
+# Попередньо скомпільовані регулярки для розбору описів/тегів предмета
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+_LOCKED_RE = re.compile(r'[Ll]ocked|[Зз]аблокировано|[Зз]аблоковано')
+# EN "Upgrade Style 6", EN alt "Style 6", RU "Стиль-улучшение 6" — одним проходом
+_STYLE_ANY_RE = re.compile(r'(?:[Uu]pgrade\s+[Ss]tyle|[Сс]тиль[- ]улучшение|[Ss]tyle)\s+(\d+)')
+_STYLE_TAG_RE = re.compile(r'(?:[Ss]tyle(?:\s+[Uu]pgrade)?|[Сс]тиль[- ]улучшение)\s+(\d+)')
+
+
+# Політика повторів для запитів до Steam (5xx, помилки з'єднання)
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# 429 не повторюємо одразу: Steam не надсилає Retry-After, а бан за частоту
+# триває хвилини — тож зупиняємо парсинг і не ходимо на маркет щонайменше стільки
+RATE_LIMIT_BACKOFF_SECONDS = 60
+
+
+def _retry_delay(attempt: int, retry_after: str | None = None) -> float:
+    """
+    Пауза перед повтором номер attempt (з 0):
+    Retry-After, якщо Steam його надіслав, інакше експоненційний backoff.
+    """
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return RETRY_BACKOFF_FACTOR * (2 ** attempt)
+
+
+def _strip_html(value: str) -> str:
+    """
+    Прибирає HTML-теги з рядка опису. Сутності (&lt;, &#39;, ...) лишаються
+    як є — текст можна безпечно підставляти в HTML-повідомлення.
+    """
+    if '<' not in value:
+        return value.strip()
+    return _HTML_TAG_RE.sub('', value).strip()
+
 
 class SteamMarketParser:
     """Парсер Steam Community Market для предметів Dota 2."""
 
     # Steam Market API endpoints
-    SEARCH_URL = "https://steamcommunity.com/market/search/render/"
     LISTINGS_URL = "https://steamcommunity.com/market/listings/{app_id}/{item_name}/render/"
     ITEM_PAGE_URL = "https://steamcommunity.com/market/listings/{app_id}/{item_name}"
 
-    def __init__(self, app_id: int = 570, proxy: str = None):
+    # Скільки сторінок лістингів качаємо одночасно (більше — ризик rate limit)
+    MAX_CONCURRENT_PAGES = 4
+
+    # Скільки варіантів предмета (classid, instanceid) тримати в кеші розбору
+    VARIANT_CACHE_SIZE = 1024
+
+    # Раз на скільки викликів parse_listings чистити застарілі сповіщені лістинги
+    PRUNE_EVERY_PARSES = 30
+
+    def __init__(self, app_id: int = 570, proxy: str = None,
+                 notified_path: str = None, notified_ttl: float = 7 * 86400):
         self.app_id = app_id
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.proxy = proxy
+        self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
                           "AppleWebKit/537.36 (KHTML, like Gecko) "
                           "Chrome/120.0.0.0 Safari/537.36",
             "Accept-Language": "en-US,en;q=0.9",
             "Accept": "application/json, text/javascript, */*; q=0.01",
+            # br декодується aiohttp автоматично, якщо встановлено brotli
+            "Accept-Encoding": "gzip, br, deflate",
             "Referer": "https://steamcommunity.com/market/",
-        })
-        if proxy:
-            self.session.proxies = {"http": proxy, "https": proxy}
-
-        # Множина ID лістингів, про які ми вже сповіщували
-        self.notified_listings: set = set()
-
-    def search_item(self, item_name: str, count: int = 100) -> dict | None:
-        """
-        Шукає предмет на маркеті за назвою.
-        Повертає JSON-відповідь або None у разі помилки.
-        """
-        params = {
-            "query": item_name,
-            "start": 0,
-            "count": count,
-            "search_descriptions": 0,
-            "sort_column": "price",
-            "sort_dir": "asc",
-            "appid": self.app_id,
-            "norender": 1,
-            "currency": 1,  # USD
         }
 
-        try:
-            response = self.session.get(
-                self.SEARCH_URL, params=params, timeout=20
-            )
-            response.raise_for_status()
-
-            # Перевіряємо rate-limiting
-            if response.status_code == 429:
-                logger.warning("⚠️ Steam rate limit! Чекаємо 60 секунд...")
-                time.sleep(60)
-                return None
-
-            data = response.json()
-
-            if not data.get("success"):
-                logger.error("❌ Steam API повернув помилку")
-                return None
-
-            total = data.get("total_count", 0)
-            logger.info(f"📊 Знайдено {total} результат(ів) для '{item_name}'")
-            return data
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"❌ Помилка запиту до Steam Market: {e}")
-            return None
-        except ValueError as e:
-            logger.error(f"❌ Помилка парсингу JSON: {e}")
-            return None
-
-    def get_item_listings_page(self, item_name: str, start: int = 0, count: int = 100) -> dict | None:
+        # aiohttp-сесія створюється при першому запиті (потрібен запущений цикл подій)
+        # і живе весь час роботи парсера — keep-alive з'єднання не перевстановлюються
+        self._session: aiohttp.ClientSession | None = None
+        # Монотонний час, до якого Steam обмежив нас за частоту запитів (429)
+        self._rate_limited_until = 0.0
+
+        # ID лістингів, про які ми вже сповіщували (або які зараз у процесі
+        # відправки), -> час позначки. Якщо задано notified_path — зберігається
+        # на диск (JSON lines) і переживає перезапуск; записи старші за
+        # notified_ttl секунд відкидаються.
+        self.notified_listings: dict[str, float] = {}
+        self._pending_listings: set[str] = set()
+        self._notified_lock = threading.Lock()
+        # Серіалізує дописування у файл і його повний перезапис (_save_notified)
+        self._notified_file_lock = threading.Lock()
+        self._notified_path = notified_path
+        self._notified_ttl = notified_ttl
+        self._parse_count = 0
+        if self._notified_path:
+            self._load_notified()
+
+        # Кеш розібраних гемів/стилів за варіантом предмета (classid, instanceid) —
+        # однакові варіанти мають однакові descriptions/tags
+        self._variant_cache: LRUCache = LRUCache(maxsize=self.VARIANT_CACHE_SIZE)
+
+        # Огляд цін рідко змінюється протягом хвилини — кешуємо за назвою предмета
+        self._price_cache: TTLCache = TTLCache(maxsize=256, ttl=60)
+
+        # Остання відповідь кожної сторінки лістингів + її ETag/Last-Modified
+        # для умовних запитів (304 Not Modified — без тіла відповіді)
+        self._page_cache: LRUCache = LRUCache(maxsize=64)
+
+    def _listings_url_prefix(self, item_name: str, count: int = 100) -> str:
         """
-        Отримує одну сторінку лістингів конкретного предмета.
-        start — зсув (0, 100, 200, ...)
-        count — кількість на сторінку (макс 100)
+        Будує URL сторінки лістингів без значення start.
+        Все, крім start, однакове для всіх сторінок — тож рахуємо один раз на парсинг.
         """
-        encoded_name = quote(item_name)
-        url = self.LISTINGS_URL.format(app_id=self.app_id, item_name=encoded_name)
-
-        params = {
-            "start": start,
+        base_url = self.LISTINGS_URL.format(app_id=self.app_id, item_name=quote(item_name))
+        base_qs = urlencode({
             "count": count,
             "currency": 1,  # USD
             "language": "english",
             "format": "json",
-        }
-
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                logger.debug(f"📡 Запит сторінки start={start}, спроба {attempt + 1}")
-                response = self.session.get(url, params=params, timeout=20)
-
-                if response.status_code == 429:
-                    wait_time = 60 * (attempt + 1)
-                    logger.warning(f"⚠️ Steam rate limit! Чекаємо {wait_time} секунд... (спроба {attempt + 1}/{max_retries})")
-                    time.sleep(wait_time)
-                    continue
-
-                response.raise_for_status()
-                data = response.json()
+        })
+        return f"{base_url}?{base_qs}&start="
+
+    def _conditional_headers(self, url: str) -> dict:
+        """Заголовки If-None-Match/If-Modified-Since для вже отриманої сторінки."""
+        cached = self._page_cache.get(url)
+        if not cached:
+            return {}
+
+        headers = {}
+        if cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+        return headers
+
+    def _remember_page(self, url: str, headers, data: dict):
+        """Запам'ятовує сторінку, якщо Steam віддав ETag або Last-Modified."""
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if etag or last_modified:
+            self._page_cache[url] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "data": data,
+            }
 
-                if not data.get("success"):
-                    logger.error(f"❌ Steam API лістингів повернув помилку: {data}")
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Повертає спільну aiohttp-сесію, створюючи її за потреби."""
+        if self._session is None or self._session.closed:
+            # ProxyConnector підтримує і HTTP, і SOCKS проксі; без проксі —
+            # звичайний пул з'єднань (trust_env підхоплює HTTP(S)_PROXY з оточення)
+            if self.proxy:
+                connector = ProxyConnector.from_url(self.proxy, limit=16, limit_per_host=8)
+            else:
+                connector = aiohttp.TCPConnector(limit=16, limit_per_host=8)
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=20),
+                connector=connector,
+                trust_env=True,
+            )
+        return self._session
+
+    async def close(self):
+        """Закриває HTTP-сесію."""
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    def _rate_limit_remaining(self) -> float:
+        """Скільки секунд ще діє обмеження після 429 (0 — якщо не діє)."""
+        return max(0.0, self._rate_limited_until - time.monotonic())
+
+    def _set_rate_limited(self, retry_after: str | None):
+        """Запам'ятовує 429: не менше RATE_LIMIT_BACKOFF_SECONDS або Retry-After, якщо він більший."""
+        backoff = float(retry_after) if retry_after and retry_after.isdigit() else 0.0
+        backoff = max(backoff, RATE_LIMIT_BACKOFF_SECONDS)
+        # Паралельні сторінки часто отримують 429 разом — логуємо лише перший
+        if not self._rate_limit_remaining():
+            logger.warning(f"🚫 Steam обмежив частоту запитів (429), пауза {backoff:.0f} сек.")
+        self._rate_limited_until = max(self._rate_limited_until, time.monotonic() + backoff)
+
+    async def _fetch_page(self, semaphore: asyncio.Semaphore, url_prefix: str, start: int) -> dict | None:
+        """
+        Отримує одну сторінку лістингів за готовим префіксом URL.
+        Кількість одночасних запитів обмежена семафором.
+        """
+        session = self._get_session()
+        url = f"{url_prefix}{start}"
+
+        async with semaphore:
+            for attempt in range(RETRY_TOTAL + 1):
+                last_attempt = attempt == RETRY_TOTAL
+                # Інша сторінка вже отримала 429 — решту запитів не робимо
+                if self._rate_limit_remaining():
+                    return None
+                try:
+                    logger.debug(f"📡 Запит сторінки start={start}, спроба {attempt + 1}")
+                    async with session.get(url, headers=self._conditional_headers(url)) as response:
+                        if response.status == 429:
+                            self._set_rate_limited(response.headers.get("Retry-After"))
+                            return None
+
+                        if response.status in RETRY_STATUSES and not last_attempt:
+                            wait_time = _retry_delay(attempt, response.headers.get("Retry-After"))
+                            logger.warning(f"⚠️ Steam відповів {response.status}, повтор через {wait_time:.1f} сек. (спроба {attempt + 1})")
+                            await asyncio.sleep(wait_time)
+                            continue
+
+                        if response.status == 304:
+                            logger.debug(f"📦 Сторінка start={start} не змінилась (304)")
+                            return self._page_cache[url]["data"]
+
+                        response.raise_for_status()
+                        data = orjson.loads(await response.read())
+                        headers = response.headers
+
+                    if not data.get("success"):
+                        logger.error(f"❌ Steam API лістингів повернув помилку: {data}")
+                        return None
+
+                    self._remember_page(url, headers, data)
+                    return data
+
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    logger.error(f"❌ Помилка запиту лістингів (спроба {attempt + 1}): {e}")
+                    if last_attempt:
+                        return None
+                    await asyncio.sleep(_retry_delay(attempt))
+                except ValueError as e:
+                    logger.error(f"❌ Помилка парсингу JSON лістингів: {e}")
                     return None
 
-                return data
-
-            except requests.exceptions.RequestException as e:
-                logger.error(f"❌ Помилка запиту лістингів (спроба {attempt + 1}): {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(10)
-                    continue
-                return None
-            except ValueError as e:
-                logger.error(f"❌ Помилка парсингу JSON лістингів: {e}")
-                return None
-        
-        logger.error("❌ Всі спроби вичерпано")
         return None
 
+    async def _fetch_pages(self, semaphore: asyncio.Semaphore, url_prefix: str,
+                           starts: list[int]) -> list[dict | None]:
+        """
+        Паралельно отримує кілька сторінок лістингів.
+        Результати повертаються в тому ж порядку, що й starts.
+        """
+        return await asyncio.gather(
+            *(self._fetch_page(semaphore, url_prefix, start) for start in starts)
+        )
+
     def extract_gems_from_descriptions(self, descriptions: list) -> list[str]:
         """
         Витягує назви гемів (Ethereal/Prismatic) з описів предмета.
@@ -150,12 +272,12 @@ class SteamMarketParser:
             # Ethereal: Effect name
             if "Prismatic:" in value or "Ethereal:" in value:
                 # Очищаємо від HTML тегів
-                clean = re.sub(r'<[^>]+>', '', value).strip()
+                clean = _strip_html(value)
                 if clean:
                     gems.append(clean)
             elif desc.get("type") == "html" and "color" in desc.get("value", ""):
                 # Деякі геми мають кольоровий текст
-                clean = re.sub(r'<[^>]+>', '', value).strip()
+                clean = _strip_html(value)
                 if clean and ("Gem" in clean or "Prismatic" in clean or "Ethereal" in clean):
                     gems.append(clean)
 
@@ -175,7 +297,7 @@ class SteamMarketParser:
             if "Socket" in value or "Gem" in value:
                 in_socket_section = True
             if in_socket_section:
-                clean = re.sub(r'<[^>]+>', '', value).strip()
+                clean = _strip_html(value)
                 if clean and clean not in ("", "Empty Socket"):
                     gems.append(clean)
 
@@ -190,42 +312,23 @@ class SteamMarketParser:
           EN: "Upgrade Style 6" (відкритий), "Upgrade Style 7 (Locked)" (заблокований)
           RU: "Стиль-улучшение 6" (відкритий), "Стиль-улучшение 7 (Заблокировано)"
         """
-        styles = []
+        styles: set[int] = set()
         if not descriptions:
-            return styles
+            return []
 
         for desc in descriptions:
             value = desc.get("value", "")
-            # Очищаємо від HTML тегів
-            clean = re.sub(r'<[^>]+>', '', value).strip()
+            # Очищаємо від HTML тегів (якщо вони взагалі є)
+            clean = _strip_html(value)
 
             # Пропускаємо заблоковані стилі
-            if re.search(r'[Ll]ocked|[Зз]аблокировано|[Зз]аблоковано', clean):
-                continue
-
-            # EN: "Upgrade Style 6" (без Locked)
-            en_match = re.search(r'[Uu]pgrade\s+[Ss]tyle\s+(\d+)', clean)
-            if en_match:
-                style_num = int(en_match.group(1))
-                if style_num not in styles:
-                    styles.append(style_num)
+            if _LOCKED_RE.search(clean):
                 continue
 
-            # EN alt: "Style 6" або "Style 6 Unlocked"
-            en_alt_match = re.search(r'[Ss]tyle\s+(\d+)', clean)
-            if en_alt_match:
-                style_num = int(en_alt_match.group(1))
-                if style_num not in styles:
-                    styles.append(style_num)
-                continue
-
-            # RU: "Стиль-улучшение 6" (без Заблокировано)
-            ru_match = re.search(r'[Сс]тиль[- ]улучшение\s+(\d+)', clean)
-            if ru_match:
-                style_num = int(ru_match.group(1))
-                if style_num not in styles:
-                    styles.append(style_num)
-                continue
+            # "Upgrade Style 6" / "Style 6" / "Стиль-улучшение 6" (без Locked)
+            match = _STYLE_ANY_RE.search(clean)
+            if match:
+                styles.add(int(match.group(1)))
 
         return sorted(styles)
 
@@ -240,22 +343,14 @@ class SteamMarketParser:
         max_style = 0
         for tag in tags:
             name = tag.get("localized_tag_name", "") or tag.get("name", "")
-            # EN: "Style 20", "Style Upgrade 20"
-            match = re.search(r'[Ss]tyle(?:\s+[Uu]pgrade)?\s+(\d+)', name)
+            # EN: "Style 20", "Style Upgrade 20"; RU: "Стиль-улучшение 20"
+            match = _STYLE_TAG_RE.search(name)
             if match:
-                style_num = int(match.group(1))
-                if style_num > max_style:
-                    max_style = style_num
-            # RU: "Стиль-улучшение 20"
-            ru_match = re.search(r'[Сс]тиль[- ]улучшение\s+(\d+)', name)
-            if ru_match:
-                style_num = int(ru_match.group(1))
-                if style_num > max_style:
-                    max_style = style_num
+                max_style = max(max_style, int(match.group(1)))
 
         return max_style if max_style > 0 else None
 
-    def parse_listings(self, item_name: str, desired_gems: list[str] = None,
+    async def parse_listings(self, item_name: str, desired_gems: list[str] = None,
                        desired_styles: list[int] = None,
                        max_price: float = 0) -> list[dict]:
         """
@@ -278,134 +373,155 @@ class SteamMarketParser:
         """
         PAGE_SIZE = 100
         found_items = []
-        start = 0
-        total_count = None
-
-        while True:
-            data = self.get_item_listings_page(item_name, start=start, count=PAGE_SIZE)
-            if not data:
-                if total_count is None:
-                    logger.error("❌ Не вдалося отримати першу сторінку лістингів")
-                else:
-                    logger.warning(f"⚠️ Не вдалося отримати сторінку {start // PAGE_SIZE + 1}, пропускаю")
-                break
 
-            if total_count is None:
-                total_count = data.get("total_count", 0)
-                logger.info(f"📋 Всього лістингів на маркеті: {total_count}")
-                if total_count == 0:
-                    logger.warning("⚠️ Steam повернув 0 лістингів — можливо предмет не існує або проблема з API")
-                    break
+        # Після 429 пропускаємо перевірки, поки діє пауза — порожній результат
+        # заодно змушує монітор збільшити інтервал
+        remaining = self._rate_limit_remaining()
+        if remaining:
+            logger.warning(f"⏸️ Steam ще обмежує запити, пропускаю перевірку ({remaining:.0f} сек.)")
+            return found_items
+
+        self._parse_count += 1
+        if self._parse_count % self.PRUNE_EVERY_PARSES == 0:
+            # Чистка перезаписує файл — не блокуємо цикл подій
+            await asyncio.to_thread(self._prune)
+
+        # Геми порівнюємо без урахування регістру — нормалізуємо фільтр один раз
+        desired_gems_lower = [g.lower() for g in desired_gems] if desired_gems else None
+
+        # Перша сторінка — щоб дізнатися total_count
+        url_prefix = self._listings_url_prefix(item_name, PAGE_SIZE)
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_PAGES)
+        data = await self._fetch_page(semaphore, url_prefix, 0)
+        if not data:
+            logger.error("❌ Не вдалося отримати першу сторінку лістингів")
+            return found_items
+
+        total_count = data.get("total_count", 0)
+        logger.info(f"📋 Всього лістингів на маркеті: {total_count}")
+        if total_count == 0:
+            logger.warning("⚠️ Steam повернув 0 лістингів — можливо предмет не існує або проблема з API")
+            return found_items
+
+        # Решту сторінок качаємо паралельно (з обмеженням MAX_CONCURRENT_PAGES).
+        # Лістинги відсортовані за ціною — якщо є ліміт ціни, качаємо пачками
+        # і зупиняємось, щойно ціна перевищила ліміт.
+        starts = list(range(PAGE_SIZE, total_count, PAGE_SIZE))
+        batch_size = self.MAX_CONCURRENT_PAGES if max_price > 0 else max(len(starts), 1)
+        batch = [(0, data)]
+
+        viewed = 0
+        while batch:
+            done = False
+            for start, page_data in batch:
+                page_num = start // PAGE_SIZE + 1
+                if not page_data:
+                    if self._rate_limit_remaining():
+                        logger.warning(f"⚠️ Сторінка {page_num}: обмеження частоти запитів, завершуємо")
+                        done = True
+                        break
+                    logger.warning(f"⚠️ Не вдалося отримати сторінку {page_num}, пропускаю")
+                    continue
 
-            listinginfo = data.get("listinginfo", {})
-            assets = data.get("assets", {})
+                listinginfo = page_data.get("listinginfo", {})
+                assets = page_data.get("assets", {})
 
-            if not listinginfo:
-                logger.info(f"📄 Сторінка {start // PAGE_SIZE + 1}: порожня, завершуємо")
-                break
+                if not listinginfo:
+                    logger.info(f"📄 Сторінка {page_num}: порожня, завершуємо")
+                    done = True
+                    break
 
-            page_num = start // PAGE_SIZE + 1
-            logger.info(f"📄 Сторінка {page_num}: обробляю {len(listinginfo)} лістингів (з {start})")
+                logger.info(f"📄 Сторінка {page_num}: обробляю {len(listinginfo)} лістингів (з {start})")
 
-            page_found = self._process_page_listings(
-                listinginfo, assets, item_name, desired_gems, desired_styles, max_price, page_num
-            )
-            found_items.extend(page_found)
+                page_found, exceeded_max, processed = self._process_page_listings(
+                    listinginfo, assets, item_name, desired_gems_lower, desired_styles, max_price, page_num
+                )
+                found_items.extend(page_found)
+                viewed += processed
 
-            # Переходимо на наступну сторінку
-            start += PAGE_SIZE
+                if exceeded_max:
+                    logger.info(f"💰 Сторінка {page_num}: ціни перевищили ${max_price}, далі не дивимось")
+                    done = True
+                    break
 
-            # Зупиняємося якщо дійшли до кінця
-            if start >= total_count:
+            if done or not starts:
                 break
 
-            # Пауза між сторінками щоб не словити rate limit
-            time.sleep(3)
+            batch_starts, starts = starts[:batch_size], starts[batch_size:]
+            logger.info(f"📡 Завантажую ще {len(batch_starts)} сторінок паралельно")
+            batch = list(zip(batch_starts, await self._fetch_pages(semaphore, url_prefix, batch_starts)))
 
-        logger.info(f"📊 Підсумок: переглянуто {start} лістингів, знайдено {len(found_items)} з потрібними стилями")
+        logger.info(f"📊 Підсумок: переглянуто {viewed} лістингів, знайдено {len(found_items)} з потрібними стилями")
         return found_items
 
     def _process_page_listings(self, listinginfo: dict, assets: dict,
                                 item_name: str, desired_gems: list[str] = None,
                                 desired_styles: list[int] = None,
-                                max_price: float = 0, page_num: int = 1) -> list[dict]:
-        """Обробляє лістинги однієї сторінки."""
+                                max_price: float = 0, page_num: int = 1) -> tuple[list[dict], bool, int]:
+        """
+        Обробляє лістинги однієї сторінки.
+        desired_gems очікуються вже в нижньому регістрі.
+
+        Повертає (знайдені предмети, чи трапився лістинг дорожчий за max_price,
+        скільки лістингів переглянуто). Лістинги йдуть за зростанням ціни, тож
+        після такого лістингу обробка зупиняється.
+        """
         found_items = []
+        exceeded_max = False
+        processed = 0
+        max_price_cents = round(max_price * 100) if max_price > 0 else 0
+
+        # Плоский індекс asset_id -> опис предмета (замість assets[app][context][asset])
+        asset_index = {
+            asset_id: asset
+            for context in assets.get(str(self.app_id), {}).values()
+            for asset_id, asset in context.items()
+        }
 
         for listing_id, listing in listinginfo.items():
-            # Пропускаємо вже сповіщені
-            if listing_id in self.notified_listings:
-                continue
-
-            # Отримуємо ціну
+            # Перевірка максимальної ціни (в центах, без float-округлень)
             price_cents = listing.get("converted_price", 0) + listing.get("converted_fee", 0)
-            price_usd = price_cents / 100.0
-            price_str = f"${price_usd:.2f} USD"
+            if max_price_cents and price_cents > max_price_cents:
+                exceeded_max = True
+                break
+
+            processed += 1
 
-            # Перевірка максимальної ціни
-            if max_price > 0 and price_usd > max_price:
+            # Пропускаємо вже сповіщені
+            if listing_id in self.notified_listings:
                 continue
 
             # Отримуємо інформацію про ассет (предмет)
             asset_info = listing.get("asset", {})
-            app_id = str(asset_info.get("appid", self.app_id))
-            context_id = str(asset_info.get("contextid", "2"))
             asset_id = str(asset_info.get("id", ""))
+            item_desc = asset_index.get(asset_id)
 
-            # Шукаємо опис предмета
-            item_desc = None
-            if app_id in assets:
-                if context_id in assets[app_id]:
-                    if asset_id in assets[app_id][context_id]:
-                        item_desc = assets[app_id][context_id][asset_id]
-
-            gems = []
-            styles = []
-            inspect_link = None
-            image_url = None
+            descriptions = []
+            tags = []
             actual_name = item_name
-
+            variant = {}
             if item_desc:
                 actual_name = item_desc.get("market_hash_name", item_name)
                 descriptions = item_desc.get("descriptions", [])
                 tags = item_desc.get("tags", [])
+                # Без обох ID варіант не визначити — розбираємо без кешу
+                classid = item_desc.get("classid")
+                instanceid = item_desc.get("instanceid")
+                if classid is not None and instanceid is not None:
+                    variant = self._variant_cache.setdefault((str(classid), str(instanceid)), {})
 
-                # Витягуємо геми
-                gems = self.extract_gems_from_descriptions(descriptions)
-                if not gems:
-                    gems = self.extract_socket_gems(descriptions)
-
-                # Витягуємо відкриті стилі
-                styles = self.extract_unlocked_styles(descriptions)
-
-                # Якщо в описах не знайшли — дивимось теги
-                if not styles:
-                    max_style = self.get_max_style_from_tags(tags)
-                    if max_style:
-                        styles = list(range(1, max_style + 1))
-
-                # Отримуємо inspect link (якщо є)
-                actions = item_desc.get("actions", []) or item_desc.get("market_actions", [])
-                for action in actions:
-                    if "inspect" in action.get("name", "").lower():
-                        link = action.get("link", "")
-                        link = link.replace("%listingid%", listing_id)
-                        link = link.replace("%assetid%", asset_id)
-                        inspect_link = link
-                        break
-
-                # Зображення
-                icon_url = item_desc.get("icon_url_large", item_desc.get("icon_url", ""))
-                if icon_url:
-                    image_url = f"https://community.akamai.steamstatic.com/economy/image/{icon_url}"
+            # Геми/стилі парсимо лише коли вони потрібні фільтру —
+            # відсіяні лістинги не витрачають час на регулярки
+            gems = None
+            styles = None
 
             # Фільтр за гемами
             if desired_gems:
-                gems_lower = [g.lower() for g in gems]
+                gems = self._get_variant_gems(variant, descriptions)
                 match = any(
-                    desired.lower() in gem_text
+                    desired in gem_text
+                    for gem_text in (html.unescape(g).lower() for g in gems)
                     for desired in desired_gems
-                    for gem_text in gems_lower
                 )
                 if not match:
                     logger.debug(
@@ -415,6 +531,7 @@ class SteamMarketParser:
 
             # Фільтр за стилями
             if desired_styles:
+                styles = self._get_variant_styles(variant, descriptions, tags)
                 has_desired_style = any(s in styles for s in desired_styles)
                 if not has_desired_style:
                     logger.debug(
@@ -422,6 +539,34 @@ class SteamMarketParser:
                     )
                     continue
 
+            # Лістинг пройшов фільтри — добираємо решту даних для сповіщення
+            if gems is None:
+                gems = self._get_variant_gems(variant, descriptions)
+            if styles is None:
+                styles = self._get_variant_styles(variant, descriptions, tags)
+
+            inspect_link = None
+            image_url = None
+            if item_desc:
+                # Отримуємо inspect link (якщо є)
+                actions = item_desc.get("actions", []) or item_desc.get("market_actions", [])
+                for action in actions:
+                    if "inspect" in action.get("name", "").lower():
+                        link = action.get("link", "")
+                        link = link.replace("%listingid%", listing_id)
+                        link = link.replace("%assetid%", asset_id)
+                        inspect_link = link
+                        break
+
+                # Зображення
+                icon_url = item_desc.get("icon_url_large", item_desc.get("icon_url", ""))
+                if icon_url:
+                    image_url = f"https://community.akamai.steamstatic.com/economy/image/{icon_url}"
+
+            # Ціну форматуємо лише для лістингів, що пройшли всі фільтри
+            price_usd = price_cents / 100.0
+            price_str = f"${price_usd:.2f} USD"
+
             item_link = self.ITEM_PAGE_URL.format(
                 app_id=self.app_id,
                 item_name=quote(item_name)
@@ -448,16 +593,151 @@ class SteamMarketParser:
                 f"Геми: {', '.join(gems) if gems else 'N/A'}"
             )
 
-        return found_items
+        return found_items, exceeded_max, processed
+
+    def _get_variant_gems(self, variant: dict, descriptions: list) -> list[str]:
+        """Геми варіанта предмета — розбираються один раз і кешуються у variant."""
+        if "gems" not in variant:
+            variant["gems"] = self._extract_item_gems(descriptions)
+        return variant["gems"]
+
+    def _get_variant_styles(self, variant: dict, descriptions: list, tags: list) -> list[int]:
+        """Стилі варіанта предмета — розбираються один раз і кешуються у variant."""
+        if "styles" not in variant:
+            variant["styles"] = self._extract_item_styles(descriptions, tags)
+        return variant["styles"]
+
+    def _extract_item_gems(self, descriptions: list) -> list[str]:
+        """Геми предмета: спершу з описів, якщо там порожньо — з секції сокетів."""
+        gems = self.extract_gems_from_descriptions(descriptions)
+        if not gems:
+            gems = self.extract_socket_gems(descriptions)
+        return gems
+
+    def _extract_item_styles(self, descriptions: list, tags: list) -> list[int]:
+        """Відкриті стилі предмета: спершу з описів, якщо там порожньо — з тегів."""
+        styles = self.extract_unlocked_styles(descriptions)
+        if not styles:
+            max_style = self.get_max_style_from_tags(tags)
+            if max_style:
+                styles = list(range(1, max_style + 1))
+        return styles
+
+    def claim_listing(self, listing_id: str) -> bool:
+        """
+        Атомарно резервує лістинг під відправку сповіщення.
+        Повертає False, якщо про нього вже сповіщено або його вже хтось резервував.
+        """
+        with self._notified_lock:
+            if listing_id in self.notified_listings:
+                return False
+            self.notified_listings[listing_id] = time.time()
+            self._pending_listings.add(listing_id)
+            return True
+
+    def release_listing(self, listing_id: str):
+        """Знімає резерв з лістингу (сповіщення не відправлено — спробуємо наступного разу)."""
+        with self._notified_lock:
+            if listing_id in self._pending_listings:
+                self._pending_listings.discard(listing_id)
+                self.notified_listings.pop(listing_id, None)
 
     def mark_as_notified(self, listing_id: str):
         """Позначає лістинг як сповіщений (щоб не дублювати)."""
-        self.notified_listings.add(listing_id)
+        ts = time.time()
+        with self._notified_lock:
+            self.notified_listings[listing_id] = ts
+            self._pending_listings.discard(listing_id)
+
+        if not self._notified_path:
+            return
 
-    def get_item_price_overview(self, item_name: str) -> dict | None:
+        try:
+            with self._notified_file_lock:
+                with open(self._notified_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"id": listing_id, "ts": ts}) + "\n")
+        except OSError as e:
+            logger.error(f"❌ Не вдалося зберегти сповіщений лістинг: {e}")
+
+    def _load_notified(self):
+        """Завантажує сповіщені лістинги з диска, відкидаючи застарілі (старші за TTL)."""
+        if not os.path.exists(self._notified_path):
+            return
+
+        cutoff = time.time() - self._notified_ttl
+        try:
+            with open(self._notified_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+
+                    # Пошкоджені/чужі рядки пропускаємо, а не падаємо на старті
+                    if not isinstance(entry, dict):
+                        continue
+                    listing_id = entry.get("id")
+                    ts = entry.get("ts")
+                    if not isinstance(listing_id, str):
+                        continue
+                    if isinstance(ts, bool) or not isinstance(ts, (int, float)):
+                        continue
+
+                    if ts >= cutoff:
+                        self.notified_listings[listing_id] = ts
+        except OSError as e:
+            logger.error(f"❌ Не вдалося прочитати файл сповіщених лістингів: {e}")
+            return
+
+        self._save_notified()
+        logger.info(f"🗂️ Завантажено {len(self.notified_listings)} сповіщених лістингів")
+
+    def _save_notified(self):
+        """
+        Атомарно перезаписує файл лише підтвердженими (не зарезервованими) лістингами.
+        Знімок і перезапис робляться під файловим локом, тож дописаний паралельно
+        mark_as_notified рядок не загубиться при os.replace.
+        """
+        with self._notified_file_lock:
+            with self._notified_lock:
+                entries = [
+                    (listing_id, ts) for listing_id, ts in self.notified_listings.items()
+                    if listing_id not in self._pending_listings
+                ]
+
+            tmp_path = self._notified_path + ".tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    for listing_id, ts in entries:
+                        f.write(json.dumps({"id": listing_id, "ts": ts}) + "\n")
+                os.replace(tmp_path, self._notified_path)
+            except OSError as e:
+                logger.error(f"❌ Не вдалося перезаписати файл сповіщених лістингів: {e}")
+
+    def _prune(self, ttl: float = None):
+        """Видаляє сповіщені лістинги, старші за ttl секунд (за замовчуванням — notified_ttl)."""
+        cutoff = time.time() - (ttl if ttl is not None else self._notified_ttl)
+        with self._notified_lock:
+            before = len(self.notified_listings)
+            self.notified_listings = {
+                listing_id: ts for listing_id, ts in self.notified_listings.items()
+                if ts >= cutoff
+            }
+            removed = before - len(self.notified_listings)
+
+        if removed:
+            logger.debug(f"🗂️ Видалено {removed} застарілих сповіщених лістингів")
+            if self._notified_path:
+                self._save_notified()
+
+    async def get_item_price_overview(self, item_name: str) -> dict | None:
         """
         Отримує загальний огляд цін на предмет (мін., макс., медіана).
+        Результат кешується на 60 секунд.
         """
+        if item_name in self._price_cache:
+            return self._price_cache[item_name]
+
         url = "https://steamcommunity.com/market/priceoverview/"
         params = {
             "appid": self.app_id,
@@ -466,18 +746,20 @@ class SteamMarketParser:
         }
 
         try:
-            response = self.session.get(url, params=params, timeout=15)
-            response.raise_for_status()
-            data = response.json()
+            async with self._get_session().get(url, params=params) as response:
+                response.raise_for_status()
+                data = orjson.loads(await response.read())
 
             if data.get("success"):
-                return {
+                overview = {
                     "lowest_price": data.get("lowest_price", "N/A"),
                     "median_price": data.get("median_price", "N/A"),
                     "volume": data.get("volume", "N/A"),
                 }
+                self._price_cache[item_name] = overview
+                return overview
             return None
 
-        except (requests.exceptions.RequestException, ValueError) as e:
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
             logger.error(f"❌ Помилка отримання цін: {e}")
             return None
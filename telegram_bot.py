@@ -2,17 +2,89 @@
 Модуль для відправки повідомлень через Telegram бота.
 """
 
+import asyncio
+import html
 import logging
+import threading
+import time
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 
 logger = logging.getLogger(__name__)
 
+# Повтори запитів до Telegram. sendMessage — неідемпотентний POST, тож
+# повторюємо лише те, що точно не доставило повідомлення: помилки з'єднання
+# і 429 (Telegram відхилив запит і каже, скільки чекати в Retry-After).
+# 5xx і таймаути читання не повторюємо — інакше сповіщення може задвоїтись.
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429,)
+
+
+def _retry_policy() -> Retry:
+    """Спільна політика повторів для HTTP-сесії бота."""
+    return Retry(
+        total=RETRY_TOTAL,
+        read=0,
+        other=0,
+        backoff_factor=RETRY_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=["GET", "POST"],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+def _html_text(text: str) -> str:
+    """
+    Екранує текст зі Steam для parse_mode=HTML. Спершу декодуємо сутності,
+    щоб уже екрановані значення (&#39;, &amp;) не екранувались двічі.
+    """
+    return html.escape(html.unescape(text), quote=False)
+
+
+class RateLimiter:
+    """
+    Token bucket: дозволяє короткі сплески до burst повідомлень,
+    а при тривалому потоці обмежує швидкість до rate повідомлень/сек.
+    """
+
+    def __init__(self, rate: float = 1.0, burst: int = 3):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Забирає один токен; якщо їх немає — чекає, поки накопичиться."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+
+            wait_time = (1 - self.tokens) / self.rate
+            logger.debug(f"⏳ Ліміт Telegram — чекаємо {wait_time:.2f} сек.")
+            time.sleep(wait_time)
+            self.tokens = 0.0
+            self.last_refill = time.monotonic()
+
 
 class TelegramNotifier:
     """Відправляє сповіщення в Telegram."""
 
     BASE_URL = "https://api.telegram.org/bot{token}"
 
+    # Telegram обмежує повідомлення 4096 символами — лишаємо запас
+    MESSAGE_LIMIT = 4000
+    BATCH_SEPARATOR = "\n\n━━━\n\n"
+
     def __init__(self, bot_token: str, chat_id: str, proxy: str = None):
         self.bot_token = bot_token
         self.chat_id = chat_id
@@ -21,6 +93,13 @@ class TelegramNotifier:
         if proxy:
             self.session.proxies = {"http": proxy, "https": proxy}
 
+        # Keep-alive пул з'єднань + повтори лише для 429 і помилок з'єднання
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=_retry_policy())
+        self.session.mount("https://", adapter)
+
+        # Telegram дозволяє ~1 повідомлення/сек в один чат (з невеликими сплесками)
+        self._limiter = RateLimiter(rate=1.0, burst=3)
+
     def send_message(self, text: str, parse_mode: str = "HTML") -> bool:
         """
         Відправляє текстове повідомлення в Telegram чат.
@@ -34,10 +113,17 @@ class TelegramNotifier:
             "disable_web_page_preview": False,
         }
 
+        self._limiter.acquire()
+
         try:
-            response = self.session.post(url, json=payload, timeout=15)
+            response = self.session.post(
+                url,
+                data=orjson.dumps(payload),
+                headers={"Content-Type": "application/json"},
+                timeout=15,
+            )
             response.raise_for_status()
-            result = response.json()
+            result = orjson.loads(response.content)
 
             if result.get("ok"):
                 logger.info("✅ Повідомлення успішно відправлено в Telegram")
@@ -49,6 +135,41 @@ class TelegramNotifier:
         except requests.exceptions.RequestException as e:
             logger.error(f"❌ Помилка відправки в Telegram: {e}")
             return False
+        except ValueError as e:
+            logger.error(f"❌ Помилка парсингу відповіді Telegram: {e}")
+            return False
+
+    def send_batch(self, items: list[dict]) -> list[dict]:
+        """
+        Відправляє кілька знайдених предметів одним повідомленням
+        (або кількома, якщо текст не вміщується в ліміт Telegram).
+        Повертає список предметів, які вдалося відправити.
+        """
+        sent = []
+        chunk_text = ""
+        chunk_items = []
+
+        for item in items:
+            msg = self.format_item_message(item)
+            candidate = f"{chunk_text}{self.BATCH_SEPARATOR}{msg}" if chunk_text else msg
+
+            if chunk_items and len(candidate) > self.MESSAGE_LIMIT:
+                if self.send_message(chunk_text):
+                    sent.extend(chunk_items)
+                chunk_text = msg
+                chunk_items = [item]
+            else:
+                chunk_text = candidate
+                chunk_items.append(item)
+
+        if chunk_items and self.send_message(chunk_text):
+            sent.extend(chunk_items)
+
+        return sent
+
+    async def send_batch_async(self, items: list[dict]) -> list[dict]:
+        """Асинхронна обгортка над send_batch."""
+        return await asyncio.to_thread(self.send_batch, items)
 
     def test_connection(self) -> bool:
         """Перевіряє з'єднання з ботом."""
@@ -56,13 +177,13 @@ class TelegramNotifier:
         try:
             response = self.session.get(url, timeout=10)
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             if data.get("ok"):
                 bot_name = data["result"]["username"]
                 logger.info(f"✅ Бот підключений: @{bot_name}")
                 return True
             return False
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, ValueError) as e:
             logger.error(f"❌ Не вдалося підключитися до бота: {e}")
             return False
 
@@ -82,14 +203,14 @@ class TelegramNotifier:
             "image_url": str (optional),
         }
         """
-        gems_text = ", ".join(item.get("gems", [])) or None
+        gems_text = ", ".join(_html_text(g) for g in item.get("gems", [])) or None
         styles = item.get("styles", [])
         styles_text = ", ".join(str(s) for s in styles) if styles else None
 
         msg = (
             "🎮 <b>ЗНАЙДЕНО ПРЕДМЕТ НА STEAM MARKET!</b>\n"
             "━━━━━━━━━━━━━━━━━━━━\n"
-            f"📦 <b>Назва:</b> {item['name']}\n"
+            f"📦 <b>Назва:</b> {_html_text(item['name'])}\n"
         )
 
         if item.get("page"):